@@ -1,11 +1,14 @@
 import logging
 import os
+from typing import Optional
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from minusone import cogs
 from minusone.database import Database
+from minusone.scheduler import ActionScheduler
+from minusone.users import QUERY_MEMBERS_LIMIT, UserDirectory
 
 logger = logging.getLogger()
 
@@ -13,9 +16,14 @@ logger = logging.getLogger()
 class DiscordBot(commands.Bot):
     def __init__(self, config: dict, **kwargs) -> None:
         self.database = None  # type: Database
+        self.scheduler = None  # type: ActionScheduler
+        self.user_directory = None  # type: UserDirectory
+        self.maintenance_tasks = []  # type: list[tasks.Loop]
+        self.cog_state = {}  # type: dict[str, dict]
+        self.required_members = {}  # type: dict[int, set[int]]
         self.config = config
 
-        for key in ["bot", "database"]:
+        for key in ["bot", "database", "scheduler", "users"]:
             if key not in config:
                 raise ValueError(f"Config is missing required key: {key}")
 
@@ -23,24 +31,142 @@ class DiscordBot(commands.Bot):
         for intent in config["bot"]["intents"]:
             intents.__setattr__(intent, True)
 
-        super().__init__(command_prefix=config["bot"]["command_prefix"], intents=intents, **kwargs)
+        if "member_cache_flags" in config["bot"]:
+            member_cache_flags = discord.MemberCacheFlags.none()
+            for flag in config["bot"]["member_cache_flags"]:
+                member_cache_flags.__setattr__(flag, True)
+        else:
+            member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+
+        super().__init__(
+            command_prefix=config["bot"]["command_prefix"],
+            intents=intents,
+            member_cache_flags=member_cache_flags,
+            chunk_guilds_at_startup=config["bot"].get("chunk_guilds_at_startup", intents.members),
+            **kwargs,
+        )
 
     async def on_ready(self):
         for guild in self.guilds:
             logger.info(f"{self.user} is connected to: {guild.name}(id: {guild.id})")
+        for guild in self.guilds:
+            await self.cache_required_members(guild)
+
+    async def on_guild_join(self, guild: discord.Guild):
+        await self.cache_required_members(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.required_members.pop(guild.id, None)
+
+    async def on_member_join(self, member: discord.Member):
+        if any(role in self._get_required_member_roles(member.guild) for role in member.roles):
+            await self._cache_required_member(member.guild, member.id)
+
+    async def on_raw_member_update(self, data: dict):
+        guild = self.get_guild(int(data["guild_id"]))
+        if guild is None:
+            return
+        roles = self._get_required_member_roles(guild)
+        role_ids = {int(role_id) for role_id in data.get("roles", [])}
+        if guild.default_role in roles or any(role.id in role_ids for role in roles):
+            await self._cache_required_member(guild, int(data["user"]["id"]))
+
+    async def cache_required_members(self, guild: discord.Guild):
+        """Cache the members of a guild holding a role from a cog's ``required_member_roles(guild)``"""
+        roles = self._get_required_member_roles(guild)
+        if not roles or guild.chunked:
+            return
+        if not self.intents.members:
+            logger.warning(f"Cannot cache required members of {guild.name} without the members intent")
+            return
+
+        if guild.default_role in roles:
+            await guild.chunk()
+            logger.info(f"Cached all {guild.member_count} members of {guild.name}")
+            return
+
+        if guild.id not in self.required_members:
+            members = await guild.chunk(cache=False)
+            self.required_members[guild.id] = {
+                member.id for member in members if any(role in roles for role in member.roles)
+            }
+        user_ids = [user_id for user_id in self.required_members[guild.id] if guild.get_member(user_id) is None]
+        for i in range(0, len(user_ids), QUERY_MEMBERS_LIMIT):
+            await guild.query_members(user_ids=user_ids[i : i + QUERY_MEMBERS_LIMIT], cache=True)
+        logger.info(f"Cached {len(user_ids)} required members of {guild.name}")
+
+    def _get_required_member_roles(self, guild: discord.Guild) -> set[discord.Role]:
+        roles = set()
+        for cog in self.cogs.values():
+            if hasattr(cog, "required_member_roles"):
+                roles.update(cog.required_member_roles(guild))
+        return roles
+
+    async def _cache_required_member(self, guild: discord.Guild, user_id: int):
+        if guild.id in self.required_members:
+            self.required_members[guild.id].add(user_id)
+        if guild.get_member(user_id) is None and self.intents.members:
+            await guild.query_members(user_ids=[user_id], cache=True)
+
+    def _dispatch_raw_member_updates(self):
+        """Dispatch ``raw_member_update`` with the payload of every member update, cached or not"""
+        # discord.py has no event for updates to uncached members, so hook its parser,
+        # in place since the gateway reads the same dict
+        parsers = getattr(self._connection, "parsers", None)
+        parse_member_update = parsers.get("GUILD_MEMBER_UPDATE") if isinstance(parsers, dict) else None
+        if parse_member_update is None:
+            logger.warning("Cannot hook member updates, members gaining a required role will not be cached")
+            return
+
+        def parse(data):
+            parse_member_update(data)
+            self.dispatch("raw_member_update", data)
+
+        parsers["GUILD_MEMBER_UPDATE"] = parse
 
     async def close(self):
+        for task in self.maintenance_tasks:
+            task.cancel()
+        if self.scheduler is not None:
+            await self.scheduler.stop()
+        logger.info("Outbound action scheduler stopped")
         if self.database is not None:
             self.database.disconnect()
         logger.info("Database connection closed")
-        super().close()
+        await super().close()
+
+    async def reload_extension(self, name: str, *, package=None):
+        """Reload an extension, handing the ``export_state()`` of its cogs to their new instances"""
+        exported = []
+        for cog in list(self.cogs.values()):
+            if cog.__module__ == name and hasattr(cog, "export_state"):
+                self.cog_state[cog.qualified_name] = cog.export_state()
+                exported.append(cog.qualified_name)
+        try:
+            await super().reload_extension(name, package=package)
+        finally:
+            for cog_name in exported:
+                self.cog_state.pop(cog_name, None)
+
+    def pop_cog_state(self, cog: commands.Cog) -> Optional[dict]:
+        """Take the state handed over to a cog by a reload, if any"""
+        return self.cog_state.pop(cog.qualified_name, None)
 
     async def setup_hook(self):
         await super().setup_hook()
+        self._dispatch_raw_member_updates()
 
-        self.database = Database(self.config["database"]["path"])
+        self.database = Database.from_config(self.config["database"])
         self.database.connect()
         logger.info("Database connection established")
+        self._start_database_maintenance()
+
+        self.user_directory = UserDirectory(self, self.database, self.config["users"])
+        self.user_directory.create_tables()
+
+        self.scheduler = ActionScheduler(self.config["scheduler"])
+        self.scheduler.start()
+        logger.info("Outbound action scheduler started")
 
         cogs_dir = os.path.dirname(os.path.abspath(cogs.__file__))
         cog_names = [
@@ -51,3 +177,26 @@ class DiscordBot(commands.Bot):
         for cog in cog_names:
             await self.load_extension(cog)
             logger.info(f"Loaded cog: {cog}")
+
+    def _start_database_maintenance(self):
+        maintenance = self.config["database"].get("maintenance", {})
+        if maintenance.get("checkpoint_minutes") and (self.database.journal_mode or "").lower() == "wal":
+            self.maintenance_tasks.append(
+                tasks.loop(minutes=maintenance["checkpoint_minutes"])(self._checkpoint_database)
+            )
+        if maintenance.get("optimize_hours"):
+            self.maintenance_tasks.append(tasks.loop(hours=maintenance["optimize_hours"])(self._optimize_database))
+        for task in self.maintenance_tasks:
+            task.start()
+
+    async def _checkpoint_database(self):
+        try:
+            self.database.checkpoint("passive")
+        except Exception as e:
+            logger.error(f"WAL checkpoint failed: {e}")
+
+    async def _optimize_database(self):
+        try:
+            self.database.optimize()
+        except Exception as e:
+            logger.error(f"Database optimize failed: {e}")
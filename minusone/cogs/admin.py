@@ -1,18 +1,50 @@
+import asyncio
+import datetime
+import io
 import logging
+import threading
 from typing import Literal, Optional
 
 import discord
 from discord.ext import commands
 
+from minusone.bot import DiscordBot
+from minusone.profiling import LoopWatchdog, SamplingProfiler
+
 logger = logging.getLogger(__name__)
 
 
 class Admin(commands.Cog, name="admin"):
     """Admin-only commands"""
 
-    def __init__(self, bot: commands.Bot) -> None:
+    def __init__(self, bot: DiscordBot) -> None:
         self.bot = bot
 
+        self.profiler = None  # type: Optional[SamplingProfiler]
+        self.profiler_task = None  # type: Optional[asyncio.Task]
+        self.watchdog = None  # type: Optional[LoopWatchdog]
+
+    async def cog_load(self):
+        state = self.bot.pop_cog_state(self)
+        if state is not None:
+            self.profiler = state["profiler"]
+            self.profiler_task = state["profiler_task"]
+            self.watchdog = state["watchdog"]
+
+    async def cog_unload(self):
+        if self.bot.cog_state.get(self.qualified_name) is not None:
+            # the profiler and watchdog keep running across a reload
+            return
+        if self.profiler_task is not None:
+            self.profiler_task.cancel()
+        if self.profiler is not None and self.profiler.running:
+            self.profiler.stop()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+
+    def export_state(self) -> dict:
+        return {"profiler": self.profiler, "profiler_task": self.profiler_task, "watchdog": self.watchdog}
+
     @commands.command(name="sync")
     @commands.is_owner()
     async def sync(
@@ -67,6 +99,71 @@ class Admin(commands.Cog, name="admin"):
         await self.bot.reload_extension(f"minusone.cogs.{cog}")
         await ctx.send(f"Reloaded {cog}")
 
+    @commands.group(name="profile", invoke_without_command=True)
+    @commands.is_owner()
+    async def profile(self, ctx: commands.Context) -> None:
+        """Sample the event loop thread and upload a collapsed-stack profile"""
+        await ctx.send_help(ctx.command)
+
+    @profile.command(name="start")
+    @commands.is_owner()
+    async def profile_start(self, ctx: commands.Context, seconds: float = 30, interval_ms: float = 10) -> None:
+        """Start profiling for a number of seconds"""
+        if self.profiler is not None and self.profiler.running:
+            await ctx.send("Profiler is already running")
+            return
+        self.profiler = SamplingProfiler(threading.get_ident(), interval=interval_ms / 1000)
+        self.profiler.start()
+        self.profiler_task = asyncio.create_task(self._stop_profiler_after(ctx, seconds))
+        await ctx.send(f"Profiling for {seconds:g}s")
+
+    @profile.command(name="stop")
+    @commands.is_owner()
+    async def profile_stop(self, ctx: commands.Context) -> None:
+        """Stop profiling early and upload the profile"""
+        if self.profiler is None or not self.profiler.running:
+            await ctx.send("Profiler is not running")
+            return
+        self.profiler_task.cancel()
+        await self._upload_profile(ctx)
+
+    async def _stop_profiler_after(self, ctx: commands.Context, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+        await self._upload_profile(ctx)
+
+    async def _upload_profile(self, ctx: commands.Context) -> None:
+        collapsed = self.profiler.stop()
+        sample_count = sum(self.profiler.samples.values())
+        filename = f"profile-{datetime.datetime.now():%Y%m%d-%H%M%S}.collapsed"
+        file = discord.File(io.BytesIO(collapsed.encode()), filename=filename)
+        await ctx.send(f"Collected {sample_count} samples", file=file)
+
+    @commands.group(name="watchdog", invoke_without_command=True)
+    @commands.is_owner()
+    async def watchdog_group(self, ctx: commands.Context) -> None:
+        """Log the stack of anything blocking the event loop for too long"""
+        await ctx.send_help(ctx.command)
+
+    @watchdog_group.command(name="start")
+    @commands.is_owner()
+    async def watchdog_start(self, ctx: commands.Context, threshold_ms: float = 250) -> None:
+        """Start the event loop watchdog"""
+        if self.watchdog is not None and self.watchdog.running:
+            self.watchdog.stop()
+        self.watchdog = LoopWatchdog(threshold=threshold_ms / 1000)
+        self.watchdog.start()
+        await ctx.send(f"Watchdog started, logging callbacks blocking the loop for more than {threshold_ms:g}ms")
+
+    @watchdog_group.command(name="stop")
+    @commands.is_owner()
+    async def watchdog_stop(self, ctx: commands.Context) -> None:
+        """Stop the event loop watchdog"""
+        if self.watchdog is None or not self.watchdog.running:
+            await ctx.send("Watchdog is not running")
+            return
+        self.watchdog.stop()
+        await ctx.send("Watchdog stopped")
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Admin(bot))
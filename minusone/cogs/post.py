@@ -11,6 +11,7 @@ from discord.ext import commands
 from matplotlib import pyplot as plt
 
 from minusone.bot import DiscordBot
+from minusone.scheduler import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -29,9 +30,20 @@ class Post(
         self.ctx_menu = app_commands.ContextMenu(name="Edit Post", callback=self.edit_context_menu)
         self.bot.tree.add_command(self.ctx_menu)
 
+        self._bulk_semaphore = asyncio.Semaphore(self.config["bulk_concurrency"])
+
+    async def cog_load(self) -> None:
+        state = self.bot.pop_cog_state(self)
+        if state is not None:
+            # bulk operations still running on the previous instance keep counting against the limit
+            self._bulk_semaphore = state["bulk_semaphore"]
+
     async def cog_unload(self) -> None:
         self.bot.tree.remove_command(self.ctx_menu.name, type=self.ctx_menu.type)
 
+    def export_state(self) -> dict:
+        return {"bulk_semaphore": self._bulk_semaphore}
+
     # region Commands
 
     @app_commands.command(name="create")
@@ -41,53 +53,26 @@ class Post(
     @app_commands.describe(title="title of forum post, if appropriate")
     async def create(self, interaction: discord.Interaction, channel: str, message: str, title: Optional[str] = None):
         """Creates a new post in the specified channel"""
-        try:
-            dest_channel_id = int(channel.split("/")[-1])
-        except ValueError:
+        dest_channel_id = self._parse_channel_link(channel)
+        if dest_channel_id is None:
             await interaction.response.send_message("Invalid channel link", ephemeral=True)
             return
 
-        try:
-            source_channel_id = int(message.split("/")[-2])
-            source_message_id = int(message.split("/")[-1])
-        except ValueError:
+        source = self._parse_message_link(message)
+        if source is None:
             await interaction.response.send_message("Invalid message link", ephemeral=True)
             return
 
-        source_channel = self.bot.get_channel(source_channel_id)
-        source_message = await source_channel.fetch_message(source_message_id)
-
-        if len(source_message.content) > 2000:
-            await interaction.response.send_message(
-                f"Message content is too long [{len(source_message.content)}/2000]", ephemeral=True
-            )
+        source_message, dest_channel = await asyncio.gather(
+            self._fetch_message(*source),
+            self._get_channel(dest_channel_id),
+        )
+        try:
+            new_message = await self._publish(source_message, dest_channel, title)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
             return
-
-        dest_channel = self.bot.get_channel(dest_channel_id)
-
-        embeds = []
-        for attachment in source_message.attachments:
-            embed = discord.Embed(url="http://dummy.url")
-            embed.set_image(url=attachment.url)
-            embeds.append(embed)
-
-        if isinstance(dest_channel, discord.ForumChannel):
-            if title is None:
-                await interaction.response.send_message("Forum posts require a title", ephemeral=True)
-                return
-            new_message = await dest_channel.create_thread(
-                name=title,
-                content=source_message.content,
-                embeds=embeds,
-            )
-            await interaction.response.send_message(f"Created post: {new_message.message.jump_url}", ephemeral=True)
-        else:
-            new_message = await dest_channel.send(
-                source_message.content,
-                embeds=embeds,
-                silent=source_message.flags.silent,
-            )
-            await interaction.response.send_message(f"Created post: {new_message.jump_url}", ephemeral=True)
+        await interaction.response.send_message(f"Created post: {new_message.jump_url}", ephemeral=True)
 
     @app_commands.command(name="edit")
     @app_commands.checks.has_any_role("OEM Officer", "OEM Strat Squad")
@@ -96,47 +81,112 @@ class Post(
     @app_commands.describe(keep_embeds="keep embeds from the source message")
     async def edit(self, interaction: discord.Interaction, destination: str, source: str, keep_embeds: bool = True):
         """Edits an existing bot post"""
-        try:
-            dest_channel_id = int(destination.split("/")[-2])
-            dest_message_id = int(destination.split("/")[-1])
-        except ValueError:
+        dest = self._parse_message_link(destination)
+        if dest is None:
             await interaction.response.send_message("Invalid destination message link", ephemeral=True)
+            return
 
-        try:
-            source_channel_id = int(source.split("/")[-2])
-            source_message_id = int(source.split("/")[-1])
-        except ValueError:
+        src = self._parse_message_link(source)
+        if src is None:
             await interaction.response.send_message("Invalid source message link", ephemeral=True)
+            return
 
-        source_channel = self.bot.get_channel(source_channel_id)
-        source_message = await source_channel.fetch_message(source_message_id)
-
-        dest_channel = self.bot.get_channel(dest_channel_id)
-        if dest_channel is None:
-            dest_channel = await self.bot.fetch_channel(dest_channel_id)
-        try:
-            if dest_channel.archived:
-                await dest_channel.edit(archived=False)
-        except AttributeError:
-            pass
-        dest_message = await dest_channel.fetch_message(dest_message_id)
-        embeds = dest_message.embeds if keep_embeds else []
-        for attachment in source_message.attachments:
-            embed = discord.Embed(url="http://dummy.url")
-            embed.set_image(url=attachment.url)
-            embeds.append(embed)
-        await dest_message.edit(content=source_message.content, embeds=embeds)
+        source_message, dest_message = await asyncio.gather(
+            self._fetch_message(*src),
+            self._fetch_post(*dest),
+        )
+        await self._apply_edit(interaction.user, dest_message, source_message, keep_embeds)
         await interaction.response.send_message(
             f"Edited post: {dest_message.jump_url}", ephemeral=True, suppress_embeds=True
         )
 
-        changelog_channel = self.bot.get_channel(self.config["changelog_channel_id"])
-        await changelog_channel.send(
-            f"{interaction.user.name} edited post: {dest_message.jump_url}. Original Content:\n\n"
-            f"{source_message.content}",
-            silent=True,
-            suppress_embeds=True,
+    @app_commands.command(name="bulkcreate")
+    @app_commands.checks.has_any_role("OEM Officer", "OEM Strat Squad")
+    @app_commands.describe(channel="link to of channel to post in")
+    @app_commands.describe(messages="space-separated links to messages with content to post, in order")
+    @app_commands.describe(titles="'|'-separated titles of forum posts, one per message, if appropriate")
+    async def bulk_create(
+        self,
+        interaction: discord.Interaction,
+        channel: str,
+        messages: str,
+        titles: Optional[str] = None,
+    ):
+        """Creates several new posts in the specified channel"""
+        await interaction.response.defer(ephemeral=True)
+        dest_channel_id = self._parse_channel_link(channel)
+        if dest_channel_id is None:
+            await interaction.followup.send("Invalid channel link", ephemeral=True)
+            return
+
+        sources = [self._parse_message_link(link) for link in messages.split()]
+        if not sources or None in sources:
+            await interaction.followup.send("Invalid message link", ephemeral=True)
+            return
+
+        title_list = [x.strip() for x in titles.split("|")] if titles else [None] * len(sources)
+        if len(title_list) != len(sources):
+            await interaction.followup.send(
+                f"Expected {len(sources)} titles, got {len(title_list)}", ephemeral=True
+            )
+            return
+
+        dest_channel, *source_messages = await asyncio.gather(
+            self._get_channel(dest_channel_id),
+            *(self._limited(self._fetch_message(*source)) for source in sources),
+            return_exceptions=True,
         )
+        if isinstance(dest_channel, discord.HTTPException):
+            await interaction.followup.send(f"Could not access channel: {dest_channel}", ephemeral=True)
+            return
+        elif isinstance(dest_channel, BaseException):
+            raise dest_channel
+
+        # posts are published one at a time so that they appear in the requested order
+        results = []
+        for i, (source_message, title) in enumerate(zip(source_messages, title_list)):
+            if isinstance(source_message, discord.HTTPException):
+                results.append(f"{i + 1}. Failed to fetch message: {source_message}")
+                continue
+            elif isinstance(source_message, BaseException):
+                raise source_message
+            try:
+                new_message = await self._publish(source_message, dest_channel, title)
+                results.append(f"{i + 1}. Created post: {new_message.jump_url}")
+            except (ValueError, discord.HTTPException) as e:
+                results.append(f"{i + 1}. Failed: {e}")
+        await self._send_results(interaction, results)
+
+    @app_commands.command(name="bulkedit")
+    @app_commands.checks.has_any_role("OEM Officer", "OEM Strat Squad")
+    @app_commands.describe(edits="space-separated pairs of destination and source message links")
+    @app_commands.describe(keep_embeds="keep embeds from the source messages")
+    async def bulk_edit(self, interaction: discord.Interaction, edits: str, keep_embeds: bool = True):
+        """Edits several existing bot posts"""
+        await interaction.response.defer(ephemeral=True)
+        links = [self._parse_message_link(link) for link in edits.split()]
+        if not links or None in links or len(links) % 2 != 0:
+            await interaction.followup.send("Expected pairs of valid destination and source links", ephemeral=True)
+            return
+
+        async def edit_one(dest: tuple[int, int], src: tuple[int, int]) -> discord.Message:
+            source_message, dest_message = await asyncio.gather(self._fetch_message(*src), self._fetch_post(*dest))
+            await self._apply_edit(interaction.user, dest_message, source_message, keep_embeds)
+            return dest_message
+
+        edited = await asyncio.gather(
+            *(self._limited(edit_one(dest, src)) for dest, src in zip(links[::2], links[1::2])),
+            return_exceptions=True,
+        )
+        results = []
+        for i, result in enumerate(edited):
+            if isinstance(result, discord.HTTPException):
+                results.append(f"{i + 1}. Failed: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                results.append(f"{i + 1}. Edited post: {result.jump_url}")
+        await self._send_results(interaction, results)
 
     async def edit_context_menu(self, interaction: discord.Interaction, message: discord.Message):
         """Edits an existing bot post"""
@@ -158,21 +208,9 @@ class Post(
                 "message", timeout=600, check=lambda m: m.author == interaction.user and not m.guild
             )
             keep_embeds = True  # TODO: make configurable
-            embeds = message.embeds if keep_embeds else []
-            for attachment in message.attachments:
-                embed = discord.Embed(url="http://dummy.url")
-                embed.set_image(url=attachment.url)
-                embeds.append(embed)
-            await message.edit(content=reply.content, embeds=embeds)
+            await self._apply_edit(interaction.user, message, reply, keep_embeds)
             await interaction.delete_original_response()
             await interaction.user.send("Edit complete.")
-
-            changelog_channel = self.bot.get_channel(self.config["changelog_channel_id"])
-            await changelog_channel.send(
-                f"{interaction.user.name} edited post: {message.jump_url}. Original Content:\n\n{reply.content}",
-                silent=True,
-                suppress_embeds=True,
-            )
         except asyncio.TimeoutError:
             await interaction.user.send("Edit timed out.")
             return
@@ -213,6 +251,113 @@ class Post(
 
     # endregion
 
+    # region Posting
+
+    def _parse_channel_link(self, link: str) -> Optional[int]:
+        """Parse a channel ID from a channel link"""
+        try:
+            return int(link.split("/")[-1])
+        except ValueError:
+            return None
+
+    def _parse_message_link(self, link: str) -> Optional[tuple[int, int]]:
+        """Parse a (channel ID, message ID) pair from a message link"""
+        try:
+            return int(link.split("/")[-2]), int(link.split("/")[-1])
+        except (ValueError, IndexError):
+            return None
+
+    async def _get_channel(self, channel_id: int):
+        """Get a channel from the cache, falling back to the API"""
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            channel = await self.bot.fetch_channel(channel_id)
+        return channel
+
+    async def _fetch_message(self, channel_id: int, message_id: int) -> discord.Message:
+        """Fetch a message without having to resolve its channel first"""
+        channel = self.bot.get_channel(channel_id) or self.bot.get_partial_messageable(channel_id)
+        return await channel.fetch_message(message_id)
+
+    async def _fetch_post(self, channel_id: int, message_id: int) -> discord.Message:
+        """Fetch a bot post for editing, unarchiving its thread if necessary"""
+        channel = await self._get_channel(channel_id)
+        if isinstance(channel, discord.Thread) and channel.archived:
+            await channel.edit(archived=False)
+        return await channel.fetch_message(message_id)
+
+    async def _send_results(self, interaction: discord.Interaction, lines: list[str]):
+        """Send the per-item results of a bulk operation, split to fit Discord's message length limit"""
+        chunk = []
+        for line in lines:
+            line = line[:2000]
+            if chunk and len("\n".join(chunk + [line])) > 2000:
+                await interaction.followup.send("\n".join(chunk), ephemeral=True, suppress_embeds=True)
+                chunk = []
+            chunk.append(line)
+        if chunk:
+            await interaction.followup.send("\n".join(chunk), ephemeral=True, suppress_embeds=True)
+
+    async def _limited(self, coro):
+        """Await a coroutine while holding a slot of the bulk operation semaphore"""
+        async with self._bulk_semaphore:
+            return await coro
+
+    def _attachment_embeds(self, message: discord.Message, embeds: Optional[list] = None) -> list[discord.Embed]:
+        """Build image embeds for a message's attachments, appended to any existing embeds"""
+        embeds = list(embeds or [])
+        for attachment in message.attachments:
+            embed = discord.Embed(url="http://dummy.url")
+            embed.set_image(url=attachment.url)
+            embeds.append(embed)
+        return embeds
+
+    async def _publish(self, source_message: discord.Message, dest_channel, title: Optional[str] = None):
+        """Publish the content of a message to a channel"""
+        if len(source_message.content) > 2000:
+            raise ValueError(f"Message content is too long [{len(source_message.content)}/2000]")
+
+        embeds = self._attachment_embeds(source_message)
+        if isinstance(dest_channel, discord.ForumChannel):
+            if title is None:
+                raise ValueError("Forum posts require a title")
+            thread = await dest_channel.create_thread(
+                name=title,
+                content=source_message.content,
+                embeds=embeds,
+            )
+            return thread.message
+        return await dest_channel.send(
+            source_message.content,
+            embeds=embeds,
+            silent=source_message.flags.silent,
+        )
+
+    async def _apply_edit(
+        self,
+        user: discord.abc.User,
+        dest_message: discord.Message,
+        source_message: discord.Message,
+        keep_embeds: bool = True,
+    ):
+        """Replace the content of a bot post and log the edit to the changelog"""
+        embeds = self._attachment_embeds(source_message, dest_message.embeds if keep_embeds else None)
+        await dest_message.edit(content=source_message.content, embeds=embeds)
+
+        changelog_channel_id = self.config["changelog_channel_id"]
+
+        async def log_edit():
+            changelog_channel = await self._get_channel(changelog_channel_id)
+            await changelog_channel.send(
+                f"{user.name} edited post: {dest_message.jump_url}. Original Content:\n\n{source_message.content}",
+                silent=True,
+                suppress_embeds=True,
+            )
+
+        self.bot.scheduler.submit(log_edit, route=("message", changelog_channel_id), priority=Priority.ADMIN)
+
+    # endregion
+
     def _plot_to_discord_file(self, ax: plt.Axes):
         buffer = io.BytesIO()
         ax.get_figure().savefig(buffer, format="png")
@@ -4,6 +4,7 @@ import discord
 from discord.ext import commands
 
 from minusone.bot import DiscordBot
+from minusone.scheduler import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,14 @@ class Twitch(
 
         self.stream_posts = {}  # type: dict[str, discord.Message]
 
+    async def cog_load(self):
+        state = self.bot.pop_cog_state(self)
+        if state is not None:
+            self.stream_posts = state["stream_posts"]
+
+    def export_state(self) -> dict:
+        return {"stream_posts": self.stream_posts}
+
     # region Listeners
 
     @commands.Cog.listener()
@@ -30,21 +39,37 @@ class Twitch(
             if isinstance(x, discord.Streaming) and x.url is not None:
                 stream = x
                 break
-        if stream is None and after.id in self.stream_posts:
-            await self.cancel_stream(after)
+        pending = self.bot.scheduler.is_pending(("stream", after.id))
+        if stream is None and (after.id in self.stream_posts or pending):
+            self._submit_stream_action(after, lambda: self.cancel_stream(after))
         elif stream is not None and after.id not in self.stream_posts:
             if self.has_streamer_role(after):
-                await self.announce_stream(after, stream)
+                self._submit_stream_action(after, lambda: self.announce_stream(after, stream))
 
     # endregion
 
+    def required_member_roles(self, guild: discord.Guild) -> list[discord.Role]:
+        # presence updates are only dispatched for cached members
+        return [role for role in guild.roles if role.name in self.config["streamer_roles"]]
+
     def has_streamer_role(self, user: discord.Member) -> bool:
         for role in user.roles:
             if role.name in self.config["streamer_roles"]:
                 return True
         return False
 
+    def _submit_stream_action(self, user: discord.Member, factory) -> None:
+        # a newer presence update for the same user supersedes any pending one
+        self.bot.scheduler.submit(
+            factory,
+            route=("message", self.config["stream_channel_id"]),
+            priority=Priority.DEFAULT,
+            key=("stream", user.id),
+        )
+
     async def announce_stream(self, user: discord.Member, activity: discord.Streaming) -> None:
+        if user.id in self.stream_posts:
+            return
         logger.info(f"Announcing stream from {user.name}: {activity.url}")
         channel = self.bot.get_channel(self.config["stream_channel_id"])
         message = await channel.send(f"{user.display_name} ({activity.twitch_name}) is live: {activity.url}")
@@ -52,6 +77,8 @@ class Twitch(
         logger.info(f"Streams: { {k: v.content for k, v in self.stream_posts.items()} }")
 
     async def cancel_stream(self, user: discord.Member) -> None:
+        if user.id not in self.stream_posts:
+            return
         logger.info(f"Cancelling stream from {user.name}")
         await self.stream_posts.pop(user.id).delete()
         logger.info(f"Streams: { {k: v.content for k, v in self.stream_posts.items()} }")
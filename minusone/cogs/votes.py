@@ -1,19 +1,26 @@
+import asyncio
 import datetime
 import io
 import logging
 import re
-from typing import Optional
+import time
+import zoneinfo
+from collections import OrderedDict, defaultdict
+from typing import Literal, Optional
 
 import discord
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 import pandas as pd
-import pytz
 from discord import app_commands
 from discord.ext import commands, tasks
 
+from minusone import export
 from minusone.bot import DiscordBot
+from minusone.database import Database
+from minusone.scheduler import Priority, TokenBucket
+from minusone.users import ResolvedUser
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +41,21 @@ EMOJIS = {
     10: "🔟",
 }
 
+MAX_COMPARE_USERS = 8
+
+# votes_per_user rows from before balances were kept per guild, adopted by each guild on first use
+LEGACY_GUILD_ID = 0
+
+# how quickly the message lag floor rises to follow clock corrections, in seconds per second
+LAG_FLOOR_RISE = 0.001
+
+# sliding windows for leaderboards and tallies, in hours
+WINDOWS = {
+    "24h": 24,
+    "7d": 7 * 24,
+    "30d": 30 * 24,
+}
+
 
 class Votes(
     commands.GroupCog,
@@ -47,12 +69,44 @@ class Votes(
         self.config: dict = self.bot.config["cogs"][self.__cog_name__.lower()]
         self.initial_votes = self.config["initial_votes"]
 
+        self._periods = {}  # type: dict[int, int]
+        self._user_buckets = OrderedDict()  # type: OrderedDict[int, TokenBucket]
+        self._channel_buckets = OrderedDict()  # type: OrderedDict[int, TokenBucket]
+        self._overloaded = False
+        self._lag_floor = None  # type: Optional[float]
+        self._lag_floor_updated = 0.0
+        self._next_runs = {}  # type: dict[str, datetime.datetime]
+
     async def cog_load(self):
-        self._create_tables()
+        self._attach_archive()
+        state = self.bot.pop_cog_state(self)
+        if state is None:
+            self._create_tables()
+            self._load_periods()
+        else:
+            self._periods = state["periods"]
+            self._user_buckets = OrderedDict(state["user_buckets"])
+            self._channel_buckets = OrderedDict(state["channel_buckets"])
+            self._next_runs = state["next_runs"]
+        self.reset_available_votes.change_interval(time=self._get_reset_times())
         self.reset_available_votes.start()
+        self.archive_votes.change_interval(hours=self.config["archive"]["interval_hours"])
+        self.archive_votes.start()
+        self.prune_vote_buckets.start()
 
     async def cog_unload(self):
         self.reset_available_votes.cancel()
+        self.archive_votes.cancel()
+        self.prune_vote_buckets.cancel()
+        self._detach_archive()
+
+    def export_state(self) -> dict:
+        return {
+            "periods": self._periods,
+            "user_buckets": self._user_buckets,
+            "channel_buckets": self._channel_buckets,
+            "next_runs": {name: self._get_next_run(name) for name in ["archive_votes", "prune_vote_buckets"]},
+        }
 
     # region Listeners
 
@@ -64,21 +118,33 @@ class Votes(
         if message.author == self.bot.user:
             return
 
+        overloaded = self._check_overload(message)
+
         parsed_message = await self._parse_message(message)
-        if parsed_message is not None:
+        if parsed_message is not None and not self._allow_vote(message):
+            logger.debug(f"Throttled vote from {message.author.name} in channel {message.channel.id}")
+        elif parsed_message is not None:
             target, votes = parsed_message
             result = self._try_vote(
                 message.created_at,
+                message.guild.id,
                 message.author.id,
                 target.id,
                 votes,
             )
-            if result > 0:
-                await message.add_reaction(EMOJIS[abs(result)])
-            elif result < 0:
-                await message.add_reaction(EMOJIS[abs(result)])
-            else:
-                await message.add_reaction(EMOJIS["fail"])
+            if result != 0:
+                logger.info(f"User {message.author.name} gave {target.name} {result} votes")
+            if not overloaded:
+                emoji = EMOJIS[abs(result)] if result != 0 else EMOJIS["fail"]
+                self.bot.scheduler.submit(
+                    lambda: message.add_reaction(emoji),
+                    route=("reaction", message.channel.id),
+                    priority=Priority.VOTE,
+                    key=("reaction", message.id),
+                )
+
+        if overloaded:
+            return
 
         for auto_vote in self.config["auto_votes"]:
             if self._check_auto_vote(auto_vote, message):
@@ -96,28 +162,94 @@ class Votes(
     @commands.is_owner()
     async def reset_available(self, ctx: commands.Context):
         """Reset available votes for all users"""
-        self._reset_all_available_votes()
+        self._start_new_period(self._get_known_guild_ids())
         await ctx.send("Reset available votes for all users")
 
+    @commands.command(name="archivevotes")
+    @commands.is_owner()
+    async def archive(self, ctx: commands.Context, horizon_days: Optional[int] = None):
+        """Archive votes older than the archive horizon"""
+        archived = await self._archive_old_votes(horizon_days)
+        await ctx.send(f"Archived {archived} votes")
+
+    @commands.command(name="exportvotes")
+    @commands.is_owner()
+    async def export_votes(self, ctx: commands.Context, fmt: Literal["csv", "parquet"] = "csv"):
+        """Snapshot the database and export vote data for analytics"""
+        config = self.bot.config["database"]
+        try:
+            paths = await asyncio.to_thread(
+                export.export_database,
+                config["path"],
+                config["export"]["directory"],
+                fmt,
+                config["export"]["chunk_size"],
+                self.config["archive"]["path"],
+            )
+        except ValueError as e:
+            await ctx.send(str(e))
+            return
+        # one file per archived month, so the listing can outgrow a single message
+        reply = "Exported vote data:"
+        for line in (f"{name}: `{path}`" for name, path in paths.items()):
+            if len(reply) + len(line) + 1 > 2000:
+                await ctx.send(reply)
+                reply = ""
+            reply += f"\n{line}"
+        await ctx.send(reply)
+
+    @commands.command(name="importvotes")
+    @commands.is_owner()
+    async def import_votes(self, ctx: commands.Context, table: str, path: str):
+        """Bulk import an exported vote table"""
+
+        def run_import():
+            # the import runs on its own connection so it never blocks the event loop
+            database = Database.from_config(self.bot.config["database"])
+            database.connect()
+            try:
+                database.attach(self.config["archive"]["path"], "archive")
+                return export.import_table(database, table, path, self.bot.config["database"]["export"]["chunk_size"])
+            finally:
+                database.disconnect()
+
+        try:
+            count = await asyncio.to_thread(run_import)
+        except (ValueError, OSError) as e:
+            await ctx.send(str(e))
+            return
+        await ctx.send(f"Imported {count} rows into {table}")
+
     @app_commands.command(name="left")
+    @app_commands.guild_only()
     async def left(self, interaction: discord.Interaction):
         """Check how many votes you have left"""
-        votes = self._get_available_votes(interaction.user.id)
+        votes = self._get_available_votes(
+            interaction.user.id, interaction.guild_id, self._get_current_period(interaction.guild_id)
+        )
         await interaction.response.send_message(f"You have {votes} votes left today.", ephemeral=True)
 
     @app_commands.command(name="tally")
-    @app_commands.describe(user="whose votes to tally")
-    async def tally(self, interaction: discord.Interaction, user: discord.User = None):
+    @app_commands.describe(user="whose votes to tally", window="only count votes from this recent window")
+    async def tally(
+        self,
+        interaction: discord.Interaction,
+        user: discord.User = None,
+        window: Optional[Literal["24h", "7d", "30d"]] = None,
+    ):
         """Check how many votes a user has received"""
         user = user or interaction.user
-        tally = self._get_total_votes_for_user(user.id)
-        await interaction.response.send_message(f"Current vote tally for <@{user.id}>: {tally}", ephemeral=True)
+        tally = self._get_total_votes_for_user(user.id, window)
+        await interaction.response.send_message(
+            f"Current vote tally for <@{user.id}>{f' (last {window})' if window else ''}: {tally}", ephemeral=True
+        )
 
     @app_commands.command(name="leaderboard")
     @app_commands.describe(
         public="show the leaderboard publicly?",
         limit="the number of users to show",
         received="show votes received (True) or issued (False)?",
+        window="only count votes from this recent window",
     )
     async def leaderboard(
         self,
@@ -125,26 +257,33 @@ class Votes(
         public: Optional[bool] = False,
         limit: Optional[int] = 10,
         received: Optional[bool] = True,
+        window: Optional[Literal["24h", "7d", "30d"]] = None,
     ):
         """Shows the current leaderboard"""
         await interaction.response.defer(ephemeral=not public)
         limit = min(limit, 50)
-        top_data = self._get_leaderboard(limit, top=True, received=received)
-        bottom_data = self._get_leaderboard(limit, top=False, received=received)
-        user_count = self._get_user_count(received)
+        top_data = self._get_leaderboard(limit, top=True, received=received, window=window)
+        bottom_data = self._get_leaderboard(limit, top=False, received=received, window=window)
+        user_count = self._get_user_count(received, window=window)
         if top_data.empty or bottom_data.empty:
             await interaction.followup.send("No leaderboard data available.", ephemeral=True)
             return
-        embed = discord.Embed(title=f"Leaderboard - Votes *{'Received' if received else 'Issued'}*", color=0x2CA453)
+        title = f"Leaderboard - Votes *{'Received' if received else 'Issued'}*"
+        if window:
+            title += f" - Last {window}"
+        embed = discord.Embed(title=title, color=0x2CA453)
+        users = await self.bot.user_directory.resolve(
+            [*top_data["user_id"], *bottom_data["user_id"]],
+            interaction.guild,
+        )
         top = []
         for i, row in enumerate(top_data.itertuples()):
-            top.append(f"{i + 1}. {self.bot.get_user(row.user_id).mention} ({int(row.votes)} points)")
+            top.append(f"{i + 1}. {self._format_user(users.get(row.user_id))} ({int(row.votes)} points)")
         top = "\n".join(top)
         bottom = []
         for i, row in enumerate(bottom_data.itertuples()):
             rank = user_count - len(bottom_data) + i + 1
-            user = self.bot.get_user(row.user_id)
-            bottom.append(f"{rank}. {'*user not found*' if user is None else user.mention} ({int(row.votes)} points)")
+            bottom.append(f"{rank}. {self._format_user(users.get(row.user_id))} ({int(row.votes)} points)")
         bottom = "\n".join(bottom)
         embed.add_field(
             name=f"Top {len(top_data)} Users",
@@ -159,10 +298,11 @@ class Votes(
         await interaction.followup.send(embed=embed, ephemeral=not public)
 
     @app_commands.command(name="grant")
+    @app_commands.guild_only()
     @app_commands.checks.has_permissions(manage_guild=True)
     async def votes_grant(self, interaction: discord.Interaction, user: discord.User, votes: int):
         """Grant votes to a user"""
-        self._add_available_votes(user.id, votes)
+        self._add_available_votes(user.id, interaction.guild_id, votes, self._get_current_period(interaction.guild_id))
         await interaction.response.send_message(f"Granted {votes} votes to <@{user.id}>.", ephemeral=True)
         logger.warn(
             f"{interaction.user.name}#{interaction.user.discriminator} granted "
@@ -195,21 +335,216 @@ class Votes(
         image = self._plot_to_discord_file(ax)
         await interaction.followup.send(file=image, ephemeral=not public)
 
+    @app_commands.command(name="compare")
+    @app_commands.describe(
+        user1="a user to compare",
+        user2="a user to compare",
+        user3="a user to compare",
+        user4="a user to compare",
+        top=f"compare the top users of the leaderboard instead (up to {MAX_COMPARE_USERS})",
+        start="only chart votes from this date on",
+        end="only chart votes up to this date",
+        public="show the chart publicly?",
+    )
+    async def votes_compare(
+        self,
+        interaction: discord.Interaction,
+        user1: Optional[discord.User] = None,
+        user2: Optional[discord.User] = None,
+        user3: Optional[discord.User] = None,
+        user4: Optional[discord.User] = None,
+        top: Optional[app_commands.Range[int, 1, MAX_COMPARE_USERS]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        public: Optional[bool] = False,
+    ):
+        """Plot the voting histories of several users on one chart"""
+        await interaction.response.defer(ephemeral=not public)
+        try:
+            start = self._parse_chart_date(start)
+            end = self._parse_chart_date(end)
+        except ValueError:
+            await interaction.followup.send("Invalid date.", ephemeral=True)
+            return
+        if start is not None and end is not None and start >= end:
+            await interaction.followup.send("start must be before end.", ephemeral=True)
+            return
+
+        if top is not None:
+            leaderboard = self._get_leaderboard(top, top=True)
+            user_ids = [int(user_id) for user_id in leaderboard["user_id"]]
+        else:
+            user_ids = list(dict.fromkeys(x.id for x in [user1, user2, user3, user4] if x is not None))
+        user_ids = user_ids or [interaction.user.id]
+
+        vote_history = self._get_vote_history_for_users(user_ids)
+        if vote_history.empty:
+            await interaction.followup.send("No voting history to compare.", ephemeral=True)
+            return
+
+        users = await self.bot.user_directory.resolve(user_ids, interaction.guild)
+        names = {user_id: users[user_id].name if user_id in users else str(user_id) for user_id in user_ids}
+        ax = self._plot_vote_comparison(vote_history, names, start=start, end=end, title="Rating Comparison")
+        image = self._plot_to_discord_file(ax)
+        await interaction.followup.send(file=image, ephemeral=not public)
+
     # endregion
 
     # region Tasks
 
-    @tasks.loop(time=datetime.time(hour=4, tzinfo=pytz.timezone("US/Eastern")))
+    @tasks.loop(time=datetime.time(hour=4, tzinfo=zoneinfo.ZoneInfo("US/Eastern")))
     async def reset_available_votes(self):
-        logger.info("Resetting available votes...")
-        reset = False
-        while not reset:
+        guild_ids = self._get_due_guild_ids(datetime.datetime.now(datetime.timezone.utc))
+        if not guild_ids:
+            return
+        logger.info(f"Resetting available votes for guilds: {guild_ids}")
+        retry = self.config["reset_retry"]
+        delay = retry["initial_delay"]
+        for attempt in range(1, retry["attempts"] + 1):
             try:
-                self._reset_all_available_votes()
-                reset = True
+                self._start_new_period(guild_ids)
             except Exception as e:
-                logger.error(e)
-        logger.info("Available votes reset.")
+                logger.error(f"Failed to reset available votes (attempt {attempt}/{retry['attempts']}): {e}")
+                if attempt < retry["attempts"]:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, retry["max_delay"])
+            else:
+                logger.info("Available votes reset.")
+                return
+        logger.error("Giving up on resetting available votes.")
+
+    def _get_reset_schedule(self, guild_id: int) -> datetime.time:
+        """Get the time of day at which a guild's available votes reset"""
+        schedule = self.config["guild_reset_schedules"].get(str(guild_id), self.config["reset_schedule"])
+        hour, minute = map(int, schedule["time"].split(":"))
+        return datetime.time(hour=hour, minute=minute, tzinfo=zoneinfo.ZoneInfo(schedule["timezone"]))
+
+    def _get_reset_times(self) -> list[datetime.time]:
+        """Get all distinct reset times across guild schedules"""
+        guild_ids = [int(guild_id) for guild_id in self.config["guild_reset_schedules"]]
+        times = {self._get_reset_schedule(guild_id) for guild_id in [0] + guild_ids}
+        return sorted(times, key=lambda x: (x.hour, x.minute, str(x.tzinfo)))
+
+    def _get_known_guild_ids(self) -> set[int]:
+        """Get the IDs of all guilds the bot is in or has vote periods for"""
+        return {guild.id for guild in self.bot.guilds} | set(self._periods)
+
+    def _get_due_guild_ids(self, now: datetime.datetime) -> list[int]:
+        """Get the guilds whose reset time is now"""
+        due = []
+        for guild_id in self._get_known_guild_ids():
+            reset_time = self._get_reset_schedule(guild_id)
+            local_now = now.astimezone(reset_time.tzinfo)
+            scheduled = datetime.datetime.combine(local_now.date(), reset_time)
+            if abs((local_now - scheduled).total_seconds()) < 60:
+                due.append(guild_id)
+        return due
+
+    @tasks.loop(hours=24)
+    async def archive_votes(self):
+        logger.info("Archiving old votes...")
+        try:
+            archived = await self._archive_old_votes()
+        except Exception as e:
+            logger.error(f"Failed to archive votes: {e}")
+            return
+        logger.info(f"Archived {archived} votes.")
+
+    @tasks.loop(hours=1)
+    async def prune_vote_buckets(self):
+        try:
+            self._prune_vote_buckets()
+        except Exception as e:
+            logger.error(f"Failed to prune vote buckets: {e}")
+
+    @archive_votes.before_loop
+    async def before_archive_votes(self):
+        await self._wait_for_next_run("archive_votes")
+
+    @prune_vote_buckets.before_loop
+    async def before_prune_vote_buckets(self):
+        await self._wait_for_next_run("prune_vote_buckets")
+
+    def _get_next_run(self, name: str) -> Optional[datetime.datetime]:
+        # a loop still waiting for a run handed over by a reload has no next iteration of its own yet
+        return getattr(self, name).next_iteration or self._next_runs.get(name)
+
+    async def _wait_for_next_run(self, name: str):
+        """Wait for the run of an interval loop that was scheduled before a reload, instead of running right away"""
+        next_run = self._next_runs.get(name)
+        if next_run is not None:
+            await discord.utils.sleep_until(next_run)
+
+    async def _archive_old_votes(self, horizon_days: Optional[int] = None):
+        """Archive votes older than the horizon in batches, yielding to the event loop in between"""
+        horizon_days = horizon_days or self.config["archive"]["horizon_days"]
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=horizon_days)
+        total = 0
+        while True:
+            archived = self._archive_vote_batch(cutoff, self.config["archive"]["batch_size"])
+            if archived == 0:
+                return total
+            total += archived
+            await asyncio.sleep(0)
+
+    # endregion
+
+    # region Throttling
+
+    def _get_throttle_bucket(self, buckets: OrderedDict, key: int, config: dict) -> TokenBucket:
+        if key in buckets:
+            buckets.move_to_end(key)
+            return buckets[key]
+        buckets[key] = TokenBucket(config["rate"], config["burst"])
+        if len(buckets) > self.config["throttle"]["max_tracked"]:
+            # evict the least recently used bucket
+            buckets.popitem(last=False)
+        return buckets[key]
+
+    def _allow_vote(self, message: discord.Message) -> bool:
+        """Take a token from the author's and the channel's vote buckets, if both have one"""
+        throttle = self.config["throttle"]
+        user_bucket = self._get_throttle_bucket(self._user_buckets, message.author.id, throttle["user"])
+        channel_bucket = self._get_throttle_bucket(self._channel_buckets, message.channel.id, throttle["channel"])
+        if not (user_bucket.can_acquire() and channel_bucket.can_acquire()):
+            return False
+        return user_bucket.try_acquire() and channel_bucket.try_acquire()
+
+    def _check_overload(self, message: discord.Message) -> bool:
+        """Enter or leave overload mode based on how far behind message handling and outbound actions are"""
+        threshold = self.config["throttle"]["overload_latency_seconds"]
+        lag = self._get_message_lag(message)
+        latency = max(lag, self.bot.scheduler.latency)
+        if not self._overloaded and latency > threshold:
+            self._overloaded = True
+            logger.warning(f"Handler latency is {latency:.1f}s, dropping reactions and auto-votes")
+        elif self._overloaded and latency < threshold / 2:
+            self._overloaded = False
+            logger.warning(f"Handler latency is {latency:.1f}s, resuming reactions and auto-votes")
+        return self._overloaded
+
+    def _get_message_lag(self, message: discord.Message) -> float:
+        """Get how far behind a message is handled, relative to the smallest lag seen"""
+        # measuring against a floor absorbs a clock offset from Discord, and letting it rise follows clock corrections
+        now = time.monotonic()
+        lag = (discord.utils.utcnow() - message.created_at).total_seconds()
+        if self._lag_floor is None:
+            self._lag_floor = lag
+        else:
+            self._lag_floor = min(lag, self._lag_floor + (now - self._lag_floor_updated) * LAG_FLOOR_RISE)
+        self._lag_floor_updated = now
+        return lag - self._lag_floor
+
+    # endregion
+
+    # region Formatting
+
+    def _format_user(self, user: Optional[ResolvedUser]) -> str:
+        if user is None:
+            return "*user not found*"
+        if user.is_member:
+            return f"<@{user.user_id}>"
+        return f"*{discord.utils.escape_markdown(user.name)}*"
 
     # endregion
 
@@ -380,6 +715,51 @@ class Votes(
             ax = self._plot_ohlc(ohlc, title=title)
         return ax
 
+    def _parse_chart_date(self, date: Optional[str]) -> Optional[pd.Timestamp]:
+        if date is None:
+            return None
+        timestamp = pd.Timestamp(date)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(self.config["chart_timezone"])
+        return timestamp.tz_convert("UTC")
+
+    def _plot_vote_comparison(
+        self,
+        vote_history: pd.DataFrame,
+        names: dict,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        title: Optional[str] = None,
+    ):
+        totals = (
+            vote_history.pivot_table(index="timestamp", columns="target_user_id", values="votes", aggfunc="sum")
+            .fillna(0)
+            .cumsum()
+        )
+        start = start if start is not None else totals.index.min() - pd.Timedelta(seconds=1)
+        end = end if end is not None else pd.Timestamp.utcnow()
+        # anchor every user at both ends of the range, carrying totals from before the range forward
+        totals = totals.reindex(totals.index.union([start, end])).ffill().fillna(0).loc[start:end]
+        freq = self._get_plot_frequency(end - start, max_bars=100)
+        totals = totals.resample(freq).last().ffill()
+        totals = totals.tz_convert(self.config["chart_timezone"])
+
+        with plt.style.context(f"minusone.resources.{self.config['mpl_stylesheet']}"):
+            _, ax = plt.subplots()
+            for user_id in totals.columns:
+                ax.plot(totals.index, totals[user_id], lw=2, label=names.get(user_id, str(user_id)))
+
+            locator = mdates.AutoDateLocator(minticks=3, maxticks=10)
+            formatter = mdates.ConciseDateFormatter(locator)
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(formatter)
+            ax.yaxis.set_major_locator(mticker.MaxNLocator(integer=True))
+            ax.legend(loc="upper left")
+            if title:
+                ax.set_title(title, loc="left", fontsize="large")
+            ax.get_figure().tight_layout()
+        return ax
+
     def _plot_to_discord_file(self, ax: plt.Axes):
         buffer = io.BytesIO()
         ax.get_figure().savefig(buffer, format="png")
@@ -391,11 +771,42 @@ class Votes(
     # region Database
 
     def _create_votes_per_user(self):
-        """Create the votes_per_user table"""
+        """Create the votes_per_user table, holding each user's available votes in each guild"""
         query = """
             CREATE TABLE IF NOT EXISTS votes_per_user (
-                user_id INTEGER PRIMARY KEY,
-                votes INTEGER NOT NULL
+                user_id INTEGER NOT NULL,
+                guild_id INTEGER NOT NULL,
+                votes INTEGER NOT NULL,
+                period INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, guild_id)
+            )
+        """
+        self.bot.database.execute(query)
+
+        columns = [row[1] for row in self.bot.database.execute("PRAGMA table_info(votes_per_user)").fetchall()]
+        if "guild_id" not in columns:
+            self._migrate_votes_per_user(columns)
+
+    def _migrate_votes_per_user(self, columns):
+        """Rebuild a votes_per_user table keyed by user alone, keeping its balances under the legacy guild"""
+        period = "period" if "period" in columns else "0"
+        with self.bot.database.transaction():
+            self.bot.database.execute("ALTER TABLE votes_per_user RENAME TO votes_per_user_old")
+            self._create_votes_per_user()
+            query = f"""
+                INSERT INTO votes_per_user (user_id, guild_id, votes, period)
+                SELECT user_id, {LEGACY_GUILD_ID}, votes, {period}
+                FROM votes_per_user_old
+            """
+            self.bot.database.execute(query)
+            self.bot.database.execute("DROP TABLE votes_per_user_old")
+
+    def _create_vote_periods(self):
+        """Create the vote_periods table, holding the current reset period of each guild"""
+        query = """
+            CREATE TABLE IF NOT EXISTS vote_periods (
+                guild_id INTEGER PRIMARY KEY,
+                period INTEGER NOT NULL
             )
         """
         self.bot.database.execute(query)
@@ -413,122 +824,378 @@ class Votes(
         """
         self.bot.database.execute(query)
 
+    def _create_vote_totals(self):
+        """Create the vote_totals table, holding the summed votes of archived history"""
+        query = """
+            CREATE TABLE IF NOT EXISTS vote_totals (
+                user_id INTEGER PRIMARY KEY,
+                received INTEGER,
+                issued INTEGER
+            )
+        """
+        self.bot.database.execute(query)
+
+    def _create_archive_table(self, month):
+        """Create the archive table for a month of vote history"""
+        query = f"""
+            CREATE TABLE IF NOT EXISTS archive.vote_history_{month} (
+                vote_id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                source_user_id INTEGER NOT NULL,
+                target_user_id INTEGER NOT NULL,
+                votes INTEGER NOT NULL
+            )
+        """
+        self.bot.database.execute(query)
+
+    def _create_vote_buckets(self):
+        """Create the vote_buckets table, holding hourly vote sums per user for sliding windows"""
+        exists = self.bot.database.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'vote_buckets'"
+        ).fetchone()[0]
+        query = """
+            CREATE TABLE IF NOT EXISTS vote_buckets (
+                user_id INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                received INTEGER,
+                issued INTEGER,
+                PRIMARY KEY (user_id, hour)
+            ) WITHOUT ROWID
+        """
+        self.bot.database.execute(query)
+        query = """
+            CREATE INDEX IF NOT EXISTS vote_buckets_hour
+            ON vote_buckets (hour)
+        """
+        self.bot.database.execute(query)
+
+        # every vote inserted into vote_history is folded into its hourly bucket
+        hour = "CAST(strftime('%s', substr(NEW.timestamp, 1, 19)) AS INTEGER) / 3600"
+        query = f"""
+            CREATE TRIGGER IF NOT EXISTS vote_history_buckets
+            AFTER INSERT ON vote_history
+            BEGIN
+                INSERT INTO vote_buckets (user_id, hour, received)
+                VALUES (NEW.target_user_id, {hour}, NEW.votes)
+                ON CONFLICT (user_id, hour) DO UPDATE SET received = COALESCE(received, 0) + excluded.received;
+                INSERT INTO vote_buckets (user_id, hour, issued)
+                VALUES (NEW.source_user_id, {hour}, NEW.votes)
+                ON CONFLICT (user_id, hour) DO UPDATE SET issued = COALESCE(issued, 0) + excluded.issued;
+            END
+        """
+        self.bot.database.execute(query)
+
+        if not exists:
+            self._backfill_vote_buckets()
+
+    def _backfill_vote_buckets(self):
+        """Fill the vote buckets from the vote history within the longest window"""
+        hour = "CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER) / 3600"
+        with self.bot.database.transaction():
+            for user_column, column in [("target_user_id", "received"), ("source_user_id", "issued")]:
+                query = f"""
+                    INSERT INTO vote_buckets (user_id, hour, {column})
+                    SELECT {user_column}, {hour} AS bucket, SUM(votes)
+                    FROM vote_history
+                    WHERE bucket >= ?
+                    GROUP BY {user_column}, bucket
+                    ON CONFLICT (user_id, hour) DO UPDATE SET {column} = excluded.{column}
+                """
+                self.bot.database.execute(query, (self._get_window_start(max(WINDOWS, key=WINDOWS.get)),))
+
     def _create_tables(self):
         """Create all tables in the database"""
+        self._create_vote_periods()
         self._create_votes_per_user()
         self._create_vote_history()
+        self._create_vote_totals()
+        self._create_vote_buckets()
+
+    def _attach_archive(self):
+        """Attach the archive database to the connection"""
+        self.bot.database.attach(self.config["archive"]["path"], "archive")
+
+    def _detach_archive(self):
+        """Detach the archive database from the connection"""
+        self.bot.database.detach("archive")
+
+    def _get_archive_tables(self):
+        """Get the names of all monthly archive tables, oldest first"""
+        query = r"""
+            SELECT name
+            FROM archive.sqlite_master
+            WHERE type = 'table' AND name LIKE 'vote\_history\_%' ESCAPE '\'
+            ORDER BY name
+        """
+        return [row[0] for row in self.bot.database.execute(query).fetchall()]
+
+    def _archive_vote_batch(self, cutoff, batch_size):
+        """Move a batch of votes older than the cutoff to the archive and fold them into the vote totals"""
+        query = """
+            SELECT vote_id, timestamp, source_user_id, target_user_id, votes
+            FROM vote_history
+            WHERE timestamp < ?
+            ORDER BY vote_id
+            LIMIT ?
+        """
+        rows = self.bot.database.execute(query, (str(cutoff), batch_size)).fetchall()
+        if not rows:
+            return 0
+
+        months = defaultdict(list)
+        received = defaultdict(int)
+        issued = defaultdict(int)
+        for row in rows:
+            _, timestamp, source_user_id, target_user_id, votes = row
+            months[re.sub(r"\D", "_", timestamp[:7])].append(row)
+            received[target_user_id] += votes
+            issued[source_user_id] += votes
+
+        with self.bot.database.transaction():
+            for month, month_rows in months.items():
+                self._create_archive_table(month)
+                query = f"""
+                    INSERT OR IGNORE INTO archive.vote_history_{month}
+                        (vote_id, timestamp, source_user_id, target_user_id, votes)
+                    VALUES (?, ?, ?, ?, ?)
+                """
+                self.bot.database.executemany(query, month_rows)
+
+        # commits are not atomic across attached databases in WAL mode, so only delete rows once they are archived;
+        # if this step is lost, the next run copies the same rows again, ignored as duplicates, and completes it
+        with self.bot.database.transaction():
+            for column, totals in [("received", received), ("issued", issued)]:
+                query = f"""
+                    INSERT INTO vote_totals (user_id, {column})
+                    VALUES (?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET {column} = COALESCE({column}, 0) + excluded.{column}
+                """
+                self.bot.database.executemany(query, totals.items())
+
+            query = """
+                DELETE FROM vote_history
+                WHERE vote_id = ?
+            """
+            self.bot.database.executemany(query, [(row[0],) for row in rows])
+        return len(rows)
+
+    def _load_periods(self):
+        """Load the current reset period of each guild"""
+        query = """
+            SELECT guild_id, period
+            FROM vote_periods
+        """
+        self._periods = dict(self.bot.database.execute(query).fetchall())
+
+    def _get_current_period(self, guild_id: int) -> int:
+        """Get the current reset period of a guild"""
+        return self._periods.get(guild_id, 0)
+
+    def _start_new_period(self, guild_ids):
+        """Start a new reset period for the given guilds, implicitly resetting their users' available votes"""
+        periods = {guild_id: self._get_current_period(guild_id) + 1 for guild_id in guild_ids}
+        query = """
+            INSERT INTO vote_periods (guild_id, period)
+            VALUES (?, ?)
+            ON CONFLICT (guild_id) DO UPDATE SET period = excluded.period
+        """
+        self.bot.database.executemany(query, list(periods.items()))
+        self._periods.update(periods)
 
-    def _initialize_user(self, user_id):
-        """Initialize a user with a certain amount of votes per day"""
+    def _refresh_available_votes(self, user_id, guild_id, period):
+        """Initialize a user in a guild, or reset their votes there if they were last refreshed in an earlier period"""
+        self._adopt_legacy_votes(user_id, guild_id, period)
+        query = """
+            INSERT INTO votes_per_user (user_id, guild_id, votes, period)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, guild_id) DO UPDATE SET votes = excluded.votes, period = excluded.period
+            WHERE votes_per_user.period < excluded.period
+        """
+        self.bot.database.execute(query, (user_id, guild_id, self.initial_votes, period))
+
+    def _adopt_legacy_votes(self, user_id, guild_id, period):
+        """Copy a user's legacy balance to a guild they have no balance in yet"""
+        # legacy periods were allocated across all guilds, so clamp them to the guild's own period
         query = f"""
-            INSERT INTO votes_per_user (user_id, votes)
-            VALUES ({user_id}, {self.initial_votes})
+            INSERT OR IGNORE INTO votes_per_user (user_id, guild_id, votes, period)
+            SELECT user_id, ?, votes, MIN(period, ?)
+            FROM votes_per_user
+            WHERE user_id = ? AND guild_id = {LEGACY_GUILD_ID}
         """
-        self.bot.database.execute(query)
+        self.bot.database.execute(query, (guild_id, period, user_id))
 
-    def _get_available_votes(self, user_id):
-        """Get the number of votes a user has left"""
+    def _get_available_votes(self, user_id, guild_id, period):
+        """Get the number of votes a user has left in a guild"""
         query = f"""
-            SELECT votes
+            SELECT votes, MIN(period, ?)
             FROM votes_per_user
-            WHERE user_id = {user_id}
+            WHERE user_id = ? AND guild_id IN (?, {LEGACY_GUILD_ID})
+            ORDER BY guild_id = {LEGACY_GUILD_ID}
+            LIMIT 1
         """
-        result = self.bot.database.execute(query).fetchone()
-        if result is None:
-            self._initialize_user(user_id)
+        result = self.bot.database.execute(query, (period, user_id, guild_id)).fetchone()
+        if result is None or result[1] < period:
             return self.initial_votes
         return result[0]
 
     def _record_vote(self, timestamp, source_user_id, target_user_id, votes):
         """Record a vote in the database"""
-        query = f"""
+        query = """
             INSERT INTO vote_history (timestamp, source_user_id, target_user_id, votes)
-            VALUES ('{timestamp}', {source_user_id}, {target_user_id}, {votes})
+            VALUES (?, ?, ?, ?)
         """
-        self.bot.database.execute(query)
+        self.bot.database.execute(query, (str(timestamp), source_user_id, target_user_id, votes))
 
-    def _add_available_votes(self, user_id, votes):
-        """Add to a user's available votes"""
-        query = f"""
+    def _add_available_votes(self, user_id, guild_id, votes, period):
+        """Add to a user's available votes in a guild"""
+        query = """
             UPDATE votes_per_user
-            SET votes = MAX(votes + {votes}, 0)
-            WHERE user_id = {user_id}
+            SET votes = MAX(votes + ?, 0)
+            WHERE user_id = ? AND guild_id = ?
         """
-        self.bot.database.execute(query)
+        with self.bot.database.transaction():
+            self._refresh_available_votes(user_id, guild_id, period)
+            self.bot.database.execute(query, (votes, user_id, guild_id))
+
+    def _spend_available_votes(self, user_id, guild_id, votes):
+        """Spend a user's available votes in a guild, only if they have enough left"""
+        query = """
+            UPDATE votes_per_user
+            SET votes = votes - ?
+            WHERE user_id = ? AND guild_id = ? AND votes >= ?
+        """
+        return self.bot.database.execute(query, (votes, user_id, guild_id, votes)).rowcount == 1
+
+    def _get_window_start(self, window):
+        """Get the first hourly bucket in a sliding window ending now"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return int(now.timestamp()) // 3600 - WINDOWS[window] + 1
+
+    def _prune_vote_buckets(self):
+        """Delete vote buckets that have slid out of the longest window"""
+        query = """
+            DELETE FROM vote_buckets
+            WHERE hour < ?
+        """
+        self.bot.database.execute(query, (self._get_window_start(max(WINDOWS, key=WINDOWS.get)),))
 
-    def _get_leaderboard(self, limit=10, top=True, received=True):
+    def _get_leaderboard(self, limit=10, top=True, received=True, window=None):
         """Get the leaderboard"""
+        if window:
+            return self._get_window_leaderboard(limit, top, received, window)
         query = f"""
-            SELECT {'target_user_id' if received else 'source_user_id'}, SUM(votes) AS votes
-            FROM vote_history
-            GROUP BY {'target_user_id' if received else 'source_user_id'}
+            SELECT user_id, SUM(votes) AS votes
+            FROM (
+                SELECT {'target_user_id' if received else 'source_user_id'} AS user_id, votes
+                FROM vote_history
+                UNION ALL
+                SELECT user_id, {'received' if received else 'issued'} AS votes
+                FROM vote_totals
+                WHERE {'received' if received else 'issued'} IS NOT NULL
+            )
+            GROUP BY user_id
             ORDER BY votes {'DESC' if top else 'ASC'}
-            LIMIT {limit}
+            LIMIT ?
         """
-        cursor = self.bot.database.execute(query)
+        cursor = self.bot.database.execute(query, (limit,))
         results = cursor.fetchall()
         df = pd.DataFrame(results, columns=["user_id", "votes"])
         df = df.sort_values("votes", ascending=False)
         return df
 
-    def _get_user_count(self, received=True):
+    def _get_window_leaderboard(self, limit, top, received, window):
+        """Get the leaderboard for a sliding window"""
+        column = "received" if received else "issued"
+        query = f"""
+            SELECT user_id, SUM({column}) AS votes
+            FROM vote_buckets
+            WHERE hour >= ? AND {column} IS NOT NULL
+            GROUP BY user_id
+            ORDER BY votes {'DESC' if top else 'ASC'}
+            LIMIT ?
+        """
+        cursor = self.bot.database.execute(query, (self._get_window_start(window), limit))
+        df = pd.DataFrame(cursor.fetchall(), columns=["user_id", "votes"])
+        df = df.sort_values("votes", ascending=False)
+        return df
+
+    def _get_user_count(self, received=True, window=None):
         """Get the number of users"""
+        if window:
+            column = "received" if received else "issued"
+            query = f"""
+                SELECT COUNT(DISTINCT user_id)
+                FROM vote_buckets
+                WHERE hour >= ? AND {column} IS NOT NULL
+            """
+            return self.bot.database.execute(query, (self._get_window_start(window),)).fetchone()[0]
         query = f"""
-            SELECT COUNT(DISTINCT {'target_user_id' if received else 'source_user_id'})
-            FROM vote_history
+            SELECT COUNT(DISTINCT user_id)
+            FROM (
+                SELECT {'target_user_id' if received else 'source_user_id'} AS user_id
+                FROM vote_history
+                UNION ALL
+                SELECT user_id
+                FROM vote_totals
+                WHERE {'received' if received else 'issued'} IS NOT NULL
+            )
         """
         result = self.bot.database.execute(query).fetchone()
         return result[0]
 
-    def _try_vote(self, timestamp, source_user_id, target_user_id, votes):
-        """Try to vote for a user"""
-        available_votes = self._get_available_votes(source_user_id)
-        if available_votes < abs(votes):
-            votes = available_votes if votes > 0 else -available_votes
-        if votes == 0:
-            return 0
-        self._record_vote(timestamp, source_user_id, target_user_id, votes)
-        self._add_available_votes(source_user_id, -abs(votes))
-        logger.info(
-            f"User {self.bot.get_user(source_user_id)} gave {self.bot.get_user(target_user_id)} {votes} "
-            f"votes out of {available_votes} left"
-        )
+    def _try_vote(self, timestamp, guild_id, source_user_id, target_user_id, votes):
+        """Try to vote for a user, spending and recording the votes in a single transaction"""
+        with self.bot.database.transaction():
+            period = self._get_current_period(guild_id)
+            self._refresh_available_votes(source_user_id, guild_id, period)
+            available_votes = self._get_available_votes(source_user_id, guild_id, period)
+            if available_votes < abs(votes):
+                votes = available_votes if votes > 0 else -available_votes
+            if votes == 0:
+                return 0
+            if not self._spend_available_votes(source_user_id, guild_id, abs(votes)):
+                return 0
+            self._record_vote(timestamp, source_user_id, target_user_id, votes)
         return votes
 
-    def _get_total_votes_for_user(self, user_id):
+    def _get_total_votes_for_user(self, user_id, window=None):
         """Get the total number of votes for a user"""
-        query = f"""
-            SELECT SUM(votes)
-            FROM vote_history
-            WHERE target_user_id = {user_id}
+        if window:
+            query = """
+                SELECT COALESCE(SUM(received), 0)
+                FROM vote_buckets
+                WHERE user_id = ? AND hour >= ?
+            """
+            return self.bot.database.execute(query, (user_id, self._get_window_start(window))).fetchone()[0]
+        query = """
+            SELECT
+                (SELECT COALESCE(SUM(votes), 0) FROM vote_history WHERE target_user_id = ?)
+                + (SELECT COALESCE(SUM(received), 0) FROM vote_totals WHERE user_id = ?)
         """
-        cursor = self.bot.database.execute(query)
-        if cursor.rowcount == 0:
-            return 0
-        return cursor.fetchone()[0]
+        return self.bot.database.execute(query, (user_id, user_id)).fetchone()[0]
 
     def _get_vote_history_for_user(self, user_id):
-        """Get the vote history for a user"""
-        query = f"""
-            SELECT timestamp, source_user_id, votes
-            FROM vote_history
-            WHERE target_user_id = {user_id}
-            ORDER BY timestamp
-        """
-        cursor = self.bot.database.execute(query)
+        """Get the vote history for a user, including archived votes"""
+        return self._get_vote_history_for_users([user_id]).drop(columns="target_user_id")
+
+    def _get_vote_history_for_users(self, user_ids):
+        """Get the vote histories of several users in a single query, including archived votes"""
+        tables = [f"archive.{table}" for table in self._get_archive_tables()] + ["vote_history"]
+        placeholders = ", ".join("?" for _ in user_ids)
+        # UNION rather than UNION ALL, so rows copied to the archive but not yet deleted are only counted once
+        query = " UNION ".join(
+            f"SELECT vote_id, timestamp, source_user_id, target_user_id, votes FROM {table} "
+            f"WHERE target_user_id IN ({placeholders})"
+            for table in tables
+        )
+        query += " ORDER BY timestamp"
+        cursor = self.bot.database.execute(query, [*user_ids] * len(tables))
         results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=["timestamp", "source_user_id", "votes"])
+        df = pd.DataFrame(results, columns=["vote_id", "timestamp", "source_user_id", "target_user_id", "votes"])
+        df = df.drop(columns="vote_id")
         df["timestamp"] = pd.to_datetime(df["timestamp"], yearfirst=True, utc=True, format="ISO8601")
         return df
 
-    def _reset_all_available_votes(self):
-        """Reset all available votes"""
-        query = f"""
-            UPDATE votes_per_user
-            SET votes = {self.initial_votes}
-        """
-        self.bot.database.execute(query)
-
     # endregion
 
 
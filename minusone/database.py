@@ -1,30 +1,145 @@
+import contextlib
 import logging
 import sqlite3
 
 logger = logging.getLogger(__name__)
 
+JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+SYNCHRONOUS_LEVELS = {"off", "normal", "full", "extra"}
+CHECKPOINT_MODES = {"passive", "full", "restart", "truncate"}
+
 
 class Database:
-    def __init__(self, path):
+    def __init__(
+        self,
+        path,
+        journal_mode=None,
+        synchronous=None,
+        cache_size=None,
+        mmap_size=None,
+        busy_timeout=None,
+        check_same_thread=True,
+    ):
+        if journal_mode is not None and journal_mode.lower() not in JOURNAL_MODES:
+            raise ValueError(f"Invalid journal mode: {journal_mode}")
+        if synchronous is not None and synchronous.lower() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Invalid synchronous level: {synchronous}")
+
         self.path = path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.check_same_thread = check_same_thread
         self.connection = None
+        self._in_transaction = False
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Create a database from the database section of the config"""
+        return cls(
+            config["path"],
+            journal_mode=config.get("journal_mode"),
+            synchronous=config.get("synchronous"),
+            cache_size=config.get("cache_size"),
+            mmap_size=config.get("mmap_size"),
+            busy_timeout=config.get("busy_timeout"),
+            check_same_thread=config.get("check_same_thread", True),
+        )
 
     def connect(self):
         """Connect to the database"""
-        self.connection = sqlite3.connect(self.path)
+        self.connection = sqlite3.connect(self.path, check_same_thread=self.check_same_thread)
+        self._apply_pragmas()
+
+    def _apply_pragmas(self):
+        """Apply the configured storage profile to the connection"""
+        if self.busy_timeout is not None:
+            self.connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        self._apply_schema_pragmas("main")
+        if self.cache_size is not None:
+            self.connection.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        if self.mmap_size is not None:
+            self.connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+
+    def _apply_schema_pragmas(self, schema):
+        """Apply the configured journal mode and synchronous level to a schema of the connection"""
+        if self.journal_mode is not None:
+            mode = self.connection.execute(f"PRAGMA {schema}.journal_mode = {self.journal_mode}").fetchone()[0]
+            if mode.lower() != self.journal_mode.lower():
+                logger.warning(f"Requested journal mode {self.journal_mode}, but {schema} is using {mode}")
+        if self.synchronous is not None:
+            self.connection.execute(f"PRAGMA {schema}.synchronous = {self.synchronous}")
+
+    def attach(self, path, schema):
+        """Attach another database file under a schema name, applying the configured storage profile"""
+        if not schema.isidentifier():
+            raise ValueError(f"Invalid schema name: {schema}")
+        attached = [row[1] for row in self.execute("PRAGMA database_list").fetchall()]
+        if schema not in attached:
+            self.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._apply_schema_pragmas(schema)
+
+    def detach(self, schema):
+        """Detach a previously attached database"""
+        self.execute(f"DETACH DATABASE {schema}")
 
     def disconnect(self):
         """Disconnect from the database"""
         if self.connection is not None:
             self.connection.close()
 
-    def execute(self, query):
+    def execute(self, query, params=()):
         """Execute a query on the database"""
         cursor = self.connection.cursor()
         try:
-            cursor.execute(query)
-            self.connection.commit()
+            cursor.execute(query, params)
+            if not self._in_transaction:
+                self.connection.commit()
         except sqlite3.Error:
             logger.error("Failed on query: %s", query)
             raise
         return cursor
+
+    def executemany(self, query, params):
+        """Execute a query on the database once for each set of parameters"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(query, params)
+            if not self._in_transaction:
+                self.connection.commit()
+        except sqlite3.Error:
+            logger.error("Failed on query: %s", query)
+            raise
+        return cursor
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the enclosed queries in a single write transaction, committing on success"""
+        if self._in_transaction:
+            yield
+            return
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+        finally:
+            self._in_transaction = False
+
+    def checkpoint(self, mode="passive"):
+        """Checkpoint the write-ahead log into the database file"""
+        if mode.lower() not in CHECKPOINT_MODES:
+            raise ValueError(f"Invalid checkpoint mode: {mode}")
+        busy, log_pages, checkpointed_pages = self.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        logger.debug(f"WAL checkpoint: busy={busy}, log pages={log_pages}, checkpointed={checkpointed_pages}")
+        return busy, log_pages, checkpointed_pages
+
+    def optimize(self):
+        """Let SQLite refresh statistics for indexes that would benefit from it"""
+        self.execute("PRAGMA optimize")
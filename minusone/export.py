@@ -0,0 +1,231 @@
+import argparse
+import csv
+import datetime
+import logging
+import os
+import re
+import sqlite3
+from typing import Optional
+
+from minusone.database import Database
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TABLES = ["vote_history", "votes_per_user", "vote_periods", "vote_totals"]
+# how rows that already exist are treated on import, keyed by table
+IMPORT_CONFLICT = {"vote_history": "IGNORE"}
+FORMATS = {"csv", "parquet"}
+# monthly tables of the archive database, see Votes._archive_vote_batch
+ARCHIVE_TABLE = re.compile(r"^vote_history_\d{4}_\d{2}$")
+
+
+def snapshot(source_path: str, dest_path: str, pages: int = 1024) -> None:
+    """Copy a consistent snapshot of a database using the SQLite online backup API"""
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages)
+    finally:
+        dest.close()
+        source.close()
+
+
+def export_table(connection: sqlite3.Connection, table: str, path: str, fmt: str = "csv", chunk_size: int = 10000):
+    """Stream a table to a CSV or Parquet file in chunks, returning the number of rows written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    cursor = connection.execute(f"SELECT * FROM {table}")
+    columns = [column[0] for column in cursor.description]
+    count = 0
+    if fmt == "csv":
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            while rows := cursor.fetchmany(chunk_size):
+                writer.writerows(rows)
+                count += len(rows)
+    else:
+        pa, pq = _import_pyarrow()
+        schema = _get_parquet_schema(connection, table, pa)
+        with pq.ParquetWriter(path, schema) as writer:
+            while rows := cursor.fetchmany(chunk_size):
+                writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema))
+                count += len(rows)
+    return count
+
+
+def _get_parquet_schema(connection: sqlite3.Connection, table: str, pa):
+    """Build a Parquet schema from the declared column types of a table, following SQLite's affinity rules"""
+    fields = []
+    for _, name, declared, *_ in connection.execute(f"PRAGMA table_info({table})"):
+        declared = declared.upper()
+        if "INT" in declared:
+            field_type = pa.int64()
+        elif any(x in declared for x in ["CHAR", "CLOB", "TEXT"]):
+            field_type = pa.string()
+        elif not declared or "BLOB" in declared:
+            field_type = pa.binary()
+        else:
+            field_type = pa.float64()
+        fields.append(pa.field(name, field_type))
+    return pa.schema(fields)
+
+
+def export_database(
+    db_path: str,
+    out_dir: str,
+    fmt: str = "csv",
+    chunk_size: int = 10000,
+    archive_path: Optional[str] = None,
+) -> dict:
+    """Snapshot a database and its archive and export their vote tables, returning the paths written"""
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    snapshot_path = os.path.join(out_dir, f"snapshot-{stamp}.db")
+    snapshot(db_path, snapshot_path)
+    paths = {"snapshot": snapshot_path}
+    paths.update(_export_snapshot(snapshot_path, lambda table: table in EXPORT_TABLES, out_dir, stamp, fmt, chunk_size))
+
+    if archive_path is not None and os.path.exists(archive_path):
+        archive_snapshot_path = os.path.join(out_dir, f"archive-snapshot-{stamp}.db")
+        snapshot(archive_path, archive_snapshot_path)
+        paths["archive_snapshot"] = archive_snapshot_path
+        paths.update(
+            _export_snapshot(archive_snapshot_path, ARCHIVE_TABLE.match, out_dir, stamp, fmt, chunk_size)
+        )
+    return paths
+
+
+def _export_snapshot(snapshot_path: str, include, out_dir: str, stamp: str, fmt: str, chunk_size: int) -> dict:
+    paths = {}
+    connection = sqlite3.connect(snapshot_path)
+    try:
+        query = "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+        for table in [row[0] for row in connection.execute(query)]:
+            if not include(table):
+                continue
+            path = os.path.join(out_dir, f"{table}-{stamp}.{fmt}")
+            count = export_table(connection, table, path, fmt, chunk_size)
+            logger.info(f"Exported {count} rows from {table} to {path}")
+            paths[table] = path
+    finally:
+        connection.close()
+    return paths
+
+
+def import_table(database: Database, table: str, path: str, chunk_size: int = 10000) -> int:
+    """Bulk load a CSV or Parquet export into a table, or a monthly table of the attached archive"""
+    if ARCHIVE_TABLE.match(table):
+        _create_archive_table(database, table)
+        target = f"archive.{table}"
+        conflict = IMPORT_CONFLICT["vote_history"]
+    elif table in EXPORT_TABLES:
+        target = table
+        conflict = IMPORT_CONFLICT.get(table, "REPLACE")
+    else:
+        raise ValueError(f"Unsupported import table: {table}")
+    schema, name = target.split(".") if "." in target else ("main", target)
+    table_columns = {row[1] for row in database.execute(f"PRAGMA {schema}.table_info({name})").fetchall()}
+    if not table_columns:
+        raise ValueError(f"Table does not exist: {table}")
+
+    count = 0
+    for columns, rows in _read_chunks(path, chunk_size):
+        unknown = set(columns) - table_columns
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+        query = f"""
+            INSERT OR {conflict} INTO {target} ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+        """
+        with database.transaction():
+            database.executemany(query, rows)
+        count += len(rows)
+    logger.info(f"Imported {count} rows into {table} from {path}")
+    return count
+
+
+def _create_archive_table(database: Database, table: str):
+    # archive tables share the schema of vote_history
+    attached = [row[1] for row in database.execute("PRAGMA database_list").fetchall()]
+    if "archive" not in attached:
+        raise ValueError("The archive database must be attached to import archive tables")
+    row = database.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'vote_history'").fetchone()
+    if row is None:
+        raise ValueError("Table does not exist: vote_history")
+    query = re.sub(r"^CREATE TABLE\s+(IF NOT EXISTS\s+)?vote_history", "", row[0].strip())
+    database.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} {query}")
+
+
+def _read_chunks(path: str, chunk_size: int):
+    if path.endswith(".parquet"):
+        _, pq = _import_pyarrow()
+        parquet_file = pq.ParquetFile(path)
+        columns = parquet_file.schema_arrow.names
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield columns, [tuple(row.values()) for row in batch.to_pylist()]
+        return
+
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        columns = next(reader)
+        rows = []
+        for row in reader:
+            rows.append([None if value == "" else value for value in row])
+            if len(rows) == chunk_size:
+                yield columns, rows
+                rows = []
+        if rows:
+            yield columns, rows
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet support requires pyarrow to be installed")
+    return pa, pq
+
+
+def main():
+    from minusone.minusone import load_config
+
+    parser = argparse.ArgumentParser(description="Export and import MinusOne vote data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="snapshot the database and export its vote tables")
+    export_parser.add_argument("out_dir", nargs="?", help="directory to write the snapshot and exports to")
+    export_parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    export_parser.add_argument("--chunk-size", type=int, default=None)
+
+    import_parser = subparsers.add_parser("import", help="bulk load an exported table into the database")
+    import_parser.add_argument(
+        "table", help=f"one of {', '.join(EXPORT_TABLES)} or an archive table vote_history_YYYY_MM"
+    )
+    import_parser.add_argument("path", help="CSV or Parquet file to import")
+    import_parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    full_config = load_config()
+    config = full_config["database"]
+    archive_path = full_config["cogs"]["votes"]["archive"]["path"]
+    chunk_size = args.chunk_size or config["export"]["chunk_size"]
+    if args.command == "export":
+        out_dir = args.out_dir or config["export"]["directory"]
+        paths = export_database(config["path"], out_dir, args.format, chunk_size, archive_path)
+        for name, path in paths.items():
+            print(f"{name}: {path}")
+    else:
+        database = Database.from_config(config)
+        database.connect()
+        try:
+            database.attach(archive_path, "archive")
+            import_table(database, args.table, args.path, chunk_size)
+        finally:
+            database.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# seconds for the dispatch latency to halve while nothing is dispatched
+LATENCY_HALF_LIFE = 5.0
+
+
+class Priority(enum.IntEnum):
+    """Priority lanes for outbound actions, lower values are dispatched first"""
+
+    ADMIN = 0
+    DEFAULT = 1
+    VOTE = 2
+
+
+class TokenBucket:
+    """A token bucket that refills at a fixed rate up to a burst capacity"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def can_acquire(self) -> bool:
+        """Check whether a token is available without taking it"""
+        self._refill()
+        return self.tokens >= 1
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def get_delay(self) -> float:
+        """Get the number of seconds until a token is available"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        """Wait for a token to become available and take it"""
+        while not self.try_acquire():
+            await asyncio.sleep(self.get_delay())
+
+
+class _Action:
+    def __init__(self, factory: Callable[[], Awaitable[Any]], route: Hashable, priority: Priority):
+        self.factory = factory
+        self.route = route
+        self.priority = priority
+        self.future = asyncio.get_running_loop().create_future()
+        # failures are logged by the worker, so callers are not required to retrieve them
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.enqueued = time.monotonic()
+
+
+class ActionScheduler:
+    """Dispatches outbound Discord actions by priority from per-route queues, each limited by its own token bucket"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.queues = {}  # type: dict[Hashable, list[tuple[int, int, Hashable]]]
+        self.pending = {}  # type: dict[Hashable, _Action]
+        self.buckets = {}  # type: dict[Hashable, TokenBucket]
+        self.workers = []  # type: list[asyncio.Task]
+        self._latency = 0.0
+        self._latency_updated = time.monotonic()
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        """Start the dispatch workers"""
+        for i in range(self.config["workers"]):
+            self.workers.append(asyncio.create_task(self._worker(), name=f"scheduler-worker-{i}"))
+
+    async def stop(self):
+        """Stop the dispatch workers, cancelling any pending actions"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+        for action in self.pending.values():
+            action.future.cancel()
+        self.pending.clear()
+        self.queues.clear()
+
+    def submit(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        route: Hashable,
+        priority: Priority = Priority.DEFAULT,
+        key: Optional[Hashable] = None,
+    ) -> asyncio.Future:
+        """Enqueue an action and return a future for its result, replacing any pending action with the same key"""
+        action = _Action(factory, route, priority)
+        if key is None:
+            key = object()
+        elif key in self.pending:
+            replaced = self.pending[key]
+            action.enqueued = replaced.enqueued
+            replaced.future.cancel()
+            if action.priority >= replaced.priority and action.route == replaced.route:
+                # the existing queue entry is dispatched at least as early, so reuse it
+                self.pending[key] = action
+                return action.future
+        self.pending[key] = action
+        heapq.heappush(self.queues.setdefault(route, []), (action.priority, next(self._counter), key))
+        self._wakeup.set()
+        return action.future
+
+    @property
+    def latency(self) -> float:
+        """Get the larger of the decaying dispatch latency and the age of the oldest pending action"""
+        now = time.monotonic()
+        latency = self._get_dispatch_latency(now)
+        if self.pending:
+            # pending keeps insertion order, and coalesced actions keep their position
+            latency = max(latency, now - next(iter(self.pending.values())).enqueued)
+        return latency
+
+    def is_pending(self, key: Hashable) -> bool:
+        """Check whether an action with the given key is waiting to be dispatched"""
+        return key in self.pending
+
+    def _get_dispatch_latency(self, now: float) -> float:
+        return self._latency * 0.5 ** ((now - self._latency_updated) / LATENCY_HALF_LIFE)
+
+    def _get_bucket(self, route: Hashable) -> TokenBucket:
+        if route not in self.buckets:
+            route_type = route[0] if isinstance(route, tuple) else route
+            bucket = self.config["routes"].get(route_type, self.config["routes"]["default"])
+            self.buckets[route] = TokenBucket(bucket["rate"], bucket["burst"])
+        return self.buckets[route]
+
+    def _take_ready_action(self) -> tuple[Optional[_Action], Optional[float]]:
+        """Take the first action of any route with a token, or get how long until one has a token"""
+        best = None
+        delay = None
+        for route, queue in list(self.queues.items()):
+            # drop entries of actions that were dispatched, or replaced on another route
+            while queue and getattr(self.pending.get(queue[0][2]), "route", None) != route:
+                heapq.heappop(queue)
+            if not queue:
+                del self.queues[route]
+                continue
+            bucket = self._get_bucket(route)
+            if bucket.can_acquire():
+                if best is None or queue[0] < self.queues[best][0]:
+                    best = route
+            else:
+                delay = min(delay, bucket.get_delay()) if delay is not None else bucket.get_delay()
+        if best is None:
+            return None, delay
+        _, _, key = heapq.heappop(self.queues[best])
+        self._get_bucket(best).try_acquire()
+        return self.pending.pop(key), 0.0
+
+    async def _worker(self):
+        while True:
+            action, delay = self._take_ready_action()
+            if action is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # exponentially weighted, so a single slow dispatch does not dominate
+            now = time.monotonic()
+            self._latency = 0.8 * self._get_dispatch_latency(now) + 0.2 * (now - action.enqueued)
+            self._latency_updated = now
+            try:
+                result = await action.factory()
+            except Exception as e:
+                logger.error(f"Outbound action on route {action.route} failed: {e!r}")
+                if not action.future.done():
+                    action.future.set_exception(e)
+            else:
+                if not action.future.done():
+                    action.future.set_result(result)
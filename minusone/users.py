@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from typing import NamedTuple, Optional
+
+import discord
+
+from minusone.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Discord limits member queries to 100 user IDs per request
+QUERY_MEMBERS_LIMIT = 100
+
+
+class ResolvedUser(NamedTuple):
+    user_id: int
+    name: str
+    is_member: bool
+
+
+class UserDirectory:
+    """Resolves user IDs to names from the client cache, a table of stored names, then Discord in bulk"""
+
+    def __init__(self, client: discord.Client, database: Database, config: dict):
+        self.client = client
+        self.database = database
+        self.ttl = config["name_ttl_hours"] * 60 * 60
+        self.semaphore = asyncio.Semaphore(config["fetch_concurrency"])
+
+    def create_tables(self):
+        """Create the user_names table"""
+        query = """
+            CREATE TABLE IF NOT EXISTS user_names (
+                user_id INTEGER NOT NULL,
+                guild_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                is_member INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, guild_id)
+            )
+        """
+        self.database.execute(query)
+
+    async def resolve(self, user_ids, guild: Optional[discord.Guild] = None) -> dict[int, ResolvedUser]:
+        """Resolve user IDs to names and guild membership, omitting users that no longer exist"""
+        guild_id = guild.id if guild is not None else 0
+        resolved = {}
+        misses = []
+        for user_id in dict.fromkeys(user_ids):
+            member = guild.get_member(user_id) if guild is not None else None
+            if member is not None:
+                resolved[user_id] = ResolvedUser(user_id, member.display_name, True)
+                continue
+            user = self.client.get_user(user_id) if guild is None else None
+            if user is not None:
+                resolved[user_id] = ResolvedUser(user_id, user.display_name, False)
+                continue
+            misses.append(user_id)
+
+        if misses:
+            resolved.update(self._load(misses, guild_id))
+            misses = [user_id for user_id in misses if user_id not in resolved]
+        if misses:
+            fetched = await self._fetch(misses, guild)
+            self._store(fetched.values(), guild_id)
+            resolved.update(fetched)
+        return resolved
+
+    def _load(self, user_ids, guild_id) -> dict[int, ResolvedUser]:
+        """Load names that have not expired from the local table"""
+        query = f"""
+            SELECT user_id, name, is_member
+            FROM user_names
+            WHERE guild_id = ? AND updated_at >= ? AND user_id IN ({', '.join('?' for _ in user_ids)})
+        """
+        params = [guild_id, time.time() - self.ttl, *user_ids]
+        rows = self.database.execute(query, params).fetchall()
+        return {row[0]: ResolvedUser(row[0], row[1], bool(row[2])) for row in rows}
+
+    def _store(self, users, guild_id):
+        """Persist fetched names to the local table"""
+        query = """
+            INSERT INTO user_names (user_id, guild_id, name, is_member, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, guild_id) DO UPDATE
+            SET name = excluded.name, is_member = excluded.is_member, updated_at = excluded.updated_at
+        """
+        now = time.time()
+        self.database.executemany(query, [(x.user_id, guild_id, x.name, x.is_member, now) for x in users])
+
+    async def _fetch(self, user_ids, guild: Optional[discord.Guild]) -> dict[int, ResolvedUser]:
+        """Fetch users from Discord, members in bulk where possible, leaving users that fail to fetch unresolved"""
+        resolved = {}
+        if guild is not None and self.client.intents.members:
+            failed = set()
+            for i in range(0, len(user_ids), QUERY_MEMBERS_LIMIT):
+                batch = user_ids[i : i + QUERY_MEMBERS_LIMIT]
+                try:
+                    members = await guild.query_members(user_ids=batch, cache=False)
+                except (discord.HTTPException, asyncio.TimeoutError) as e:
+                    logger.warning(f"Failed to query {len(batch)} members of {guild.name}: {e!r}")
+                    failed.update(batch)
+                    continue
+                for member in members:
+                    resolved[member.id] = ResolvedUser(member.id, member.display_name, True)
+            non_members = [user_id for user_id in user_ids if user_id not in resolved and user_id not in failed]
+            results = await asyncio.gather(*(self._fetch_user(user_id) for user_id in non_members))
+        else:
+            results = await asyncio.gather(*(self._fetch_user(user_id, guild) for user_id in user_ids))
+        resolved.update({x.user_id: x for x in results if x is not None})
+        return resolved
+
+    async def _fetch_user(self, user_id, guild: Optional[discord.Guild] = None) -> Optional[ResolvedUser]:
+        async with self.semaphore:
+            try:
+                if guild is not None:
+                    try:
+                        member = await guild.fetch_member(user_id)
+                        return ResolvedUser(user_id, member.display_name, True)
+                    except discord.NotFound:
+                        pass
+                try:
+                    user = await self.client.fetch_user(user_id)
+                except discord.NotFound:
+                    logger.info(f"User {user_id} no longer exists")
+                    return None
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to fetch user {user_id}: {e!r}")
+                return None
+            return ResolvedUser(user_id, user.display_name, False)